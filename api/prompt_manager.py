@@ -9,10 +9,15 @@ Handles:
 """
 
 import os
-import json
+import hashlib
+import functools
+import threading
 from utils.logger import get_logger
 from typing import Dict, Any, Optional
 
+import fastjsonschema
+import orjson
+from cachetools import TTLCache
 from google import genai
 from google.genai.types import Schema, GenerateContentConfig
 
@@ -42,6 +47,26 @@ class PromptManager:
         "example": "string"
     }
 
+    # JSON-Schema equivalent of JSON_SCHEMA, used to validate the model output
+    # (validation also fills in the JSON-LD @context/@type defaults)
+    RESPONSE_JSON_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "@context": {"type": "string", "default": "https://schema.org/"},
+            "@type": {"type": "string", "default": "SecurityVulnerability"},
+            "owasp_ref": {"type": "string"},
+            "compliance": {"type": "string"},
+            "vuln_abstract": {"type": "string"},
+            "description": {"type": "string"},
+            "recommendation": {"type": "string"},
+            "example": {"type": "string"}
+        },
+        "required": [
+            "owasp_ref", "compliance", "vuln_abstract",
+            "description", "recommendation", "example"
+        ]
+    }
+
     def build_prompt(self, vuln_name: str, platform: str) -> str:
         """
         Builds a contextually rich prompt for Gemini structured output.
@@ -62,6 +87,12 @@ Each field must:
         """.strip()
 
 
+# Compiled once at import; raises fastjsonschema.JsonSchemaException on mismatch
+VALIDATE = fastjsonschema.compile(PromptManager.RESPONSE_JSON_SCHEMA)
+
+PROMPT_MANAGER = PromptManager()
+
+
 # ------------------------------------------------------------------------------
 # 🤖 GeminiClient — Executes prompt using Google GenAI SDK (Structured Output)
 # ------------------------------------------------------------------------------
@@ -75,6 +106,38 @@ class GeminiClient:
     MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
     TIMEOUT = int(os.getenv("GEMINI_TIMEOUT_SECONDS", "20"))
 
+    # Structured schema, built once per process
+    RESPONSE_SCHEMA = Schema(
+        type="object",
+        properties={
+            "@context": Schema(type="string", default="https://schema.org/"),
+            "@type": Schema(type="string", default="SecurityVulnerability"),
+            "owasp_ref": Schema(type="string", description="Platform-specific OWASP mapping(only one from the "
+                                                           "latest OWASP for the platforms: 1)Web/API/LLM in the "
+                                                           "format OWASP top 10 <year>:<Ax for web/API or LLMx "
+                                                           "for LLM> - <top-10 name>). 2)Mobile_x(iOS or Android) in the format "
+                                                           "MASVS-<category>-<integer value from 0 to 9>"),
+            "compliance": Schema(type="string", description="Applicable compliance frameworks like NIST, ISO."),
+            "vuln_abstract": Schema(type="string",
+                                    description="Brief summary of the vulnerability and its potential impact."),
+            "description": Schema(type="string", description="Detailed description of the vulnerability."),
+            "recommendation": Schema(type="string", description="Mitigation and remediation recommendations."),
+            "example": Schema(type="string", description="Example exploit scenario for this vulnerability.")
+        },
+        required=[
+            "owasp_ref", "compliance", "vuln_abstract",
+            "description", "recommendation", "example"
+        ]
+    )
+
+    # Request config is identical for every call, so it is built once too
+    CONFIG = GenerateContentConfig(
+        temperature=0.0,
+        response_mime_type="application/json",
+        response_schema=RESPONSE_SCHEMA,
+        max_output_tokens=2500
+    )
+
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
@@ -86,71 +149,128 @@ class GeminiClient:
             logger.exception("Failed to initialize Google GenAI client.")
             raise RuntimeError("Gemini client initialization failed") from e
 
-        logger.info(f"Initialized Google GenAI client with model: {self.MODEL}")
-
-        # Prebuild structured schema
-        self.response_schema = Schema(
-            type="object",
-            properties={
-                "@context": Schema(type="string", default="https://schema.org/"),
-                "@type": Schema(type="string", default="SecurityVulnerability"),
-                "owasp_ref": Schema(type="string", description="Platform-specific OWASP mapping(only one from the "
-                                                               "latest OWASP for the platforms: 1)Web/API/LLM in the "
-                                                               "format OWASP top 10 <year>:<Ax for web/API or LLMx "
-                                                               "for LLM> - <top-10 name>). 2)Mobile_x(iOS or Android) in the format "
-                                                               "MASVS-<category>-<integer value from 0 to 9>"),
-                "compliance": Schema(type="string", description="Applicable compliance frameworks like NIST, ISO."),
-                "vuln_abstract": Schema(type="string",
-                                        description="Brief summary of the vulnerability and its potential impact."),
-                "description": Schema(type="string", description="Detailed description of the vulnerability."),
-                "recommendation": Schema(type="string", description="Mitigation and remediation recommendations."),
-                "example": Schema(type="string", description="Example exploit scenario for this vulnerability.")
-            },
-            required=[
-                "owasp_ref", "compliance", "vuln_abstract",
-                "description", "recommendation", "example"
-            ]
-        )
+        logger.info("Initialized Google GenAI client with model: %s", self.MODEL)
+
+    @staticmethod
+    def _parse(response) -> Dict[str, Any]:
+        # full SDK response repr is large; only rendered when DEBUG is enabled
+        logger.debug("gemeni output: %r", response)
+        parsed = getattr(response, "parsed", None)
+        if parsed:
+            logger.info("Gemini returned structured parsed output.")
+        # fallback — manually parse if SDK changes format
+        else:
+            parsed = extract_json(getattr(response, "text", None))
+            if parsed is None:
+                raise ValueError("Gemini returned non-parsable output.")
+
+        # single validation point: raises on schema mismatch, fills @context/@type
+        return VALIDATE(parsed)
 
     def generate(self, prompt: str) -> Dict[str, Any]:
         """
         Generates structured JSON output from Gemini.
         """
         try:
-            config = GenerateContentConfig(
-                temperature=0.0,
-                response_mime_type="application/json",
-                response_schema=self.response_schema,
-                max_output_tokens=2500
-            )
-
             logger.info("Invoking Gemini with structured schema enforcement...")
             response = self.client.models.generate_content(
                 model=self.MODEL,
                 contents=prompt,
-                config=config
+                config=self.CONFIG
             )
-            logger.info(f"gemeni output: {response}")
-            if hasattr(response, "parsed") and response.parsed:
-                logger.info("Gemini returned structured parsed output.")
-                return response.parsed  # Already a dict (schema-enforced)
-
-            # fallback — manually parse if SDK changes format
-            if hasattr(response, "text"):
-                text = response.text.strip()
-                return json.loads(text)
-
-            return {}
+            return self._parse(response)
 
         except Exception as e:
             logger.exception("Gemini structured generation failed.")
             raise RuntimeError(f"Gemini structured generation failed: {e}") from e
 
 
+@functools.lru_cache(maxsize=1)
+def get_gemini_client() -> "GeminiClient":
+    """
+    Returns the process-wide GeminiClient, created on first use so a missing
+    GEMINI_API_KEY only fails the requests that need it.
+    """
+    return GeminiClient()
+
+
+# ------------------------------------------------------------------------------
+# 🗃️ Response cache — generation is deterministic (temperature=0.0)
+# ------------------------------------------------------------------------------
+
+_CACHE = TTLCache(maxsize=int(os.getenv("GEMINI_CACHE_SIZE", "4096")),
+                  ttl=int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "86400")))
+_CACHE_LOCK = threading.RLock()
+
+
+def _cache_key(vuln_name: str, platform: str) -> str:
+    raw = f"{GeminiClient.MODEL}|{vuln_name.lower().strip()}|{platform}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+    return dict(cached) if cached is not None else None
+
+
+def _cache_put(key: str, parsed: Dict[str, Any]) -> None:
+    if parsed:
+        with _CACHE_LOCK:
+            _CACHE[key] = dict(parsed)
+
+
+def generate_cached(vuln_name: str, platform: str) -> Dict[str, Any]:
+    """
+    Returns Gemini metadata for (vuln_name, platform), reusing a cached
+    result when the same pair was generated recently.
+    """
+    key = _cache_key(vuln_name, platform)
+    cached = _cache_get(key)
+    if cached is not None:
+        logger.info("Gemini cache hit for %s/%s", vuln_name, platform)
+        return cached
+
+    prompt = PROMPT_MANAGER.build_prompt(vuln_name, platform)
+    parsed = get_gemini_client().generate(prompt)
+    _cache_put(key, parsed)
+    return parsed
+
+
 # ------------------------------------------------------------------------------
 # 🧩 Helper — Robust JSON Extractor (fallback for manual parsing)
 # ------------------------------------------------------------------------------
 
+def _json_object_candidates(text: str):
+    """
+    Yields each top-level {...} span in text, matching braces outside of
+    JSON string literals.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif depth:
+            if ch == '"':
+                in_string = True
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    yield text[start:i + 1]
+
+
 def extract_json(text: str) -> Optional[Dict[str, Any]]:
     """
     Attempts to extract JSON from non-schema model outputs.
@@ -159,18 +279,16 @@ def extract_json(text: str) -> Optional[Dict[str, Any]]:
     if not text:
         return None
     try:
-        return json.loads(str(text))
-    except Exception:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1:
-            candidate = text[start:end + 1]
-            try:
-                return json.loads(candidate)
-            except Exception:
-                sanitized = candidate.replace("'", "\"")
-                try:
-                    return json.loads(sanitized)
-                except Exception:
-                    return None
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode("utf-8", errors="replace")
+    for candidate in _json_object_candidates(str(text)):
+        try:
+            return orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            continue
+    # the old single->double quote rewrite is gone; log so such outputs stay visible
+    logger.warning("No parsable JSON object found in model output")
     return None
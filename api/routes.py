@@ -1,17 +1,39 @@
 # api/routes.py
+from concurrent.futures import ThreadPoolExecutor
+
+import msgspec
 from flask import Blueprint, request, jsonify, current_app
 from pymongo import errors
-from bson import json_util
-from schemas.testcase_schema import TestCaseSchema, GenerateSchema, ValidationError
-from utils.db import get_collection
+from pymongo.write_concern import WriteConcern
+from schemas.testcase_schema import (load_test_case, load_test_cases, load_partial_test_case, normalize_platform,
+                                     decode_generate_request, decode_generate_batch, ValidationError)
+from utils.db import get_collection, has_index
+from utils.serialization import dumps_bytes
 from utils.logger import get_logger
 
 logger = get_logger("APIs")
 # Import from modular AI helper
-from api.prompt_manager import PromptManager, GeminiClient, extract_json
+from api.prompt_manager import generate_cached
 
 bp = Blueprint("api", __name__, url_prefix="/api/v1")
-schema = TestCaseSchema()
+INSERT_CHUNK_SIZE = 1000
+
+def _as_items(payload, required=None):
+    """
+    Normalizes a request body to a list of items. Accepts {"test_cases": [...]}, a bare
+    array, or a single object (which must contain `required` when given);
+    returns None for any other shape.
+    """
+    if isinstance(payload, dict):
+        items = payload.get("test_cases")
+        if isinstance(items, list):
+            return items
+        if required is None or required in payload:
+            return [payload]
+        return None
+    if isinstance(payload, list):
+        return payload
+    return None
 
 @bp.route("/test_cases", methods=["GET"])
 def read_test_cases():
@@ -32,21 +54,34 @@ def read_test_cases():
     platform = request.args.get("platform")
     query = {}
     if platform:
-        # rely on normalization similar to schema
         try:
-            # reuse schema's normalization by calling load on a fake payload
-            validated = schema.load({"vuln_id": "TCS_DUMMY_1", "vuln_name": "dummy", "platform": platform})
-            # we only use normalized platform value
-            normalized_platform = validated["platform"]
-            query["platform"] = normalized_platform
-        except Exception:
+            query["platform"] = normalize_platform(platform)
+        except ValidationError:
             return jsonify({"error": "Invalid platform value"}), 400
     try:
-        docs = list(coll.find(query))
-        return current_app.response_class(response=json_util.dumps({"test_cases": docs}), status=200, mimetype="application/json")
+        cursor = coll.find(query, projection={"_id": 0}, batch_size=500)
+        # hinting a missing index fails the query, so only hint one known to exist
+        if query and has_index("platform_1"):
+            cursor = cursor.hint("platform_1")
+        # pull the first document here so query errors still map to a 500
+        first = next(cursor, None)
     except errors.PyMongoError:
         return jsonify({"error": "Database read error"}), 500
 
+    def generate():
+        # stream the array one document at a time instead of materializing it
+        try:
+            yield b'{"test_cases":['
+            if first is not None:
+                yield dumps_bytes(first)
+                for doc in cursor:
+                    yield b"," + dumps_bytes(doc)
+            yield b"]}"
+        finally:
+            cursor.close()
+
+    return current_app.response_class(response=generate(), status=200, mimetype="application/json")
+
 @bp.route("/test_cases", methods=["POST"])
 def add_test_cases():
     """
@@ -63,45 +98,68 @@ def add_test_cases():
             - type: array
               items:
                 $ref: '#/definitions/TestCase'
+      - in: header
+        name: X-Ack
+        type: string
+        required: false
+        description: Set to "none" to insert batches without waiting for write acknowledgement
     responses:
       201:
         description: Inserted
+      202:
+        description: Batch sent without write acknowledgement (X-Ack none)
       400:
         description: Validation error
     """
     coll = get_collection()
-    payload = request.get_json(silent=True)
-    if payload is None:
+    try:
+        payload = msgspec.json.decode(request.get_data())
+    except msgspec.DecodeError:
         return jsonify({"error": "Invalid or missing JSON"}), 400
 
-    # normalize to list
-    items = []
-    if isinstance(payload, dict) and "test_cases" in payload and isinstance(payload["test_cases"], list):
-        items = payload["test_cases"]
-    elif isinstance(payload, list):
-        items = payload
-    elif isinstance(payload, dict):
-        items = [payload]
-    else:
+    items = _as_items(payload)
+    if items is None:
         return jsonify({"error": "Payload must be an object or array"}), 400
 
-    clean_docs = []
-    for item in items:
-        try:
-            validated = schema.load(item)
-            clean_docs.append(validated)
-        except Exception as e:
-            return jsonify({"error": "Validation failed", "message": str(e), "item": item}), 400
+    try:
+        clean_docs = load_test_cases(items)
+    except Exception:
+        # error path only: re-check item by item to report the offending one
+        for item in items:
+            try:
+                load_test_case(item)
+            except Exception as e:
+                return jsonify({"error": "Validation failed", "message": str(e), "item": item}), 400
+        raise
 
     try:
         if len(clean_docs) == 1:
             coll.insert_one(clean_docs[0])
             return jsonify({"inserted": 1, "vuln_id": clean_docs[0]["vuln_id"]}), 201
-        else:
-            result = coll.insert_many(clean_docs, ordered=False)
-            return jsonify({"inserted": len(result.inserted_ids)}), 201
-    except errors.BulkWriteError as bwe:
-        return jsonify({"error": "Bulk write error", "details": bwe.details}), 409
+        # fire-and-forget bulk loads: the caller opts out of write acknowledgement
+        unacknowledged = request.headers.get("X-Ack", "").lower() == "none"
+        bulk_coll = coll.with_options(write_concern=WriteConcern(w=0)) if unacknowledged else coll
+        inserted = 0
+        write_errors = []
+        # bounded batches keep each write round-trip short on large payloads
+        for start in range(0, len(clean_docs), INSERT_CHUNK_SIZE):
+            try:
+                # pymongo rejects bypass_document_validation with an unacknowledged write concern
+                result = bulk_coll.insert_many(clean_docs[start:start + INSERT_CHUNK_SIZE], ordered=False,
+                                               bypass_document_validation=not unacknowledged)
+                inserted += len(result.inserted_ids)
+            except errors.BulkWriteError as bwe:
+                inserted += bwe.details.get("nInserted", 0)
+                for err in bwe.details.get("writeErrors", []):
+                    err["index"] = err.get("index", 0) + start
+                    write_errors.append(err)
+        if write_errors:
+            return jsonify({"error": "Bulk write error",
+                            "details": {"nInserted": inserted, "writeErrors": write_errors}}), 409
+        if unacknowledged:
+            # w=0 reports no write errors; this is the number of documents sent
+            return jsonify({"inserted": inserted, "acknowledged": False}), 202
+        return jsonify({"inserted": inserted}), 201
     except errors.DuplicateKeyError:
         return jsonify({"error": "Duplicate vuln_id detected"}), 409
     except errors.PyMongoError:
@@ -119,18 +177,13 @@ def update_test_cases():
         description: update processed
     """
     coll = get_collection()
-    payload = request.get_json(silent=True)
-    if payload is None:
+    try:
+        payload = msgspec.json.decode(request.get_data())
+    except msgspec.DecodeError:
         return jsonify({"error": "Invalid or missing JSON"}), 400
 
-    items = []
-    if isinstance(payload, dict) and "test_cases" in payload and isinstance(payload["test_cases"], list):
-        items = payload["test_cases"]
-    elif isinstance(payload, list):
-        items = payload
-    elif isinstance(payload, dict) and "vuln_id" in payload:
-        items = [payload]
-    else:
+    items = _as_items(payload, required="vuln_id")
+    if items is None:
         return jsonify({"error": "Payload must be object/array or contain vuln_id"}), 400
 
     results = {"updated": 0, "not_found": []}
@@ -143,18 +196,8 @@ def update_test_cases():
         up.pop("vuln_id")
         if not up:
             continue
-        # validate partial update by merging with minimal required fields (schema requires vuln_id & vuln_name)
-        # create dummy payload to run normalization and validation for fields present
-        dummy = {"vuln_id": vuln_id, "vuln_name": "DUMMY_NAME"}
-        dummy.update(up)
         try:
-            validated = schema.load(dummy)
-            # only keep fields that were actually in the user payload (not dummy)
-            for k in list(validated.keys()):
-                if k in ("vuln_id","vuln_name") and k not in item:
-                    # remove dummy-required fields if they were not provided originally
-                    validated.pop(k,None)
-            update_doc = {k: v for k, v in validated.items() if k in item and k != "vuln_id"}
+            update_doc = load_partial_test_case(up)
         except Exception as e:
             return jsonify({"error": "Validation failed for update", "message": str(e), "item": item}), 400
 
@@ -185,23 +228,18 @@ def delete_test_cases():
     if payload is None:
         return jsonify({"error": "Invalid or missing JSON"}), 400
 
-    vuln_ids = []
-    if isinstance(payload, dict) and "vuln_ids" in payload and isinstance(payload["vuln_ids"], list):
+    if isinstance(payload, dict) and isinstance(payload.get("vuln_ids"), list):
         vuln_ids = payload["vuln_ids"]
-    elif isinstance(payload, list):
-        for p in payload:
-            if isinstance(p, str):
-                vuln_ids.append(p)
-            elif isinstance(p, dict) and "vuln_id" in p:
-                vuln_ids.append(p["vuln_id"])
-    elif isinstance(payload, dict) and "test_cases" in payload:
-        for tc in payload["test_cases"]:
-            if isinstance(tc, dict) and "vuln_id" in tc:
-                vuln_ids.append(tc["vuln_id"])
-    elif isinstance(payload, dict) and "vuln_id" in payload:
-        vuln_ids.append(payload["vuln_id"])
     else:
-        return jsonify({"error": "Provide vuln_ids list or test_cases array or vuln_id"}), 400
+        items = _as_items(payload, required="vuln_id")
+        if items is None:
+            return jsonify({"error": "Provide vuln_ids list or test_cases array or vuln_id"}), 400
+        vuln_ids = []
+        for item in items:
+            if isinstance(item, str):
+                vuln_ids.append(item)
+            elif isinstance(item, dict) and "vuln_id" in item:
+                vuln_ids.append(item["vuln_id"])
 
     if not vuln_ids:
         return jsonify({"error": "No vuln_ids found to delete"}), 400
@@ -256,44 +294,95 @@ responses:
     description: LLM generation or JSON parsing error
 
     """
-    payload = request.get_json(silent=True)
-    if not payload:
-        return jsonify({"error": "Invalid or missing JSON payload"}), 400
-    logger.info(f"Payload received: {payload}")
-    prompt_schema = GenerateSchema()
     try:
-        validated = prompt_schema.load(payload)
+        validated = decode_generate_request(request.get_data())
     except ValidationError as e:
-        return jsonify({"error": "validation_error", "messages": e.messages}), 400
-    logger.info(f"Schema validation successful")
-    vuln_name = validated["vuln_name"].strip()
-    platform = validated["platform"].strip()
+        # same shape as marshmallow's error dict; msgspec reports one error, not per field
+        return jsonify({"error": "validation_error", "messages": {"_schema": [str(e)]}}), 400
+    except msgspec.DecodeError:
+        return jsonify({"error": "Invalid or missing JSON payload"}), 400
+    logger.info("Payload received: %s", validated)
+    logger.info("Schema validation successful")
+    vuln_name = validated.vuln_name.strip()
+    platform = validated.platform.strip()
 
     try:
-        prompt = PromptManager().build_prompt(vuln_name, platform)
-        response = GeminiClient().generate(prompt)
-        logger.info(f"Prompt fed to LLM and received response: {response}")
-        if isinstance(response, str) or isinstance(response, bytes) or isinstance(response, bytearray):
-            parsed = extract_json(response)
-            if not parsed:
-                return jsonify({
-                    "error": "parse_failed",
-                    "message": "Gemini returned non-parsable output.",
-                    "raw_output": response
-                }), 502
+        parsed = generate_cached(vuln_name, platform)
+        logger.debug("Prompt fed to LLM and received response: %s", parsed)
+        return jsonify(parsed), 200
 
-        parsed = response
+    except Exception as e:
+        logger.exception("Generation failed")
+        return jsonify({"error": "generation_failed", "message": str(e)}), 502
 
+# ------------------------------------------------------------------------------
+# 🚀 Endpoint: /generate_metadata_batch
+# ------------------------------------------------------------------------------
 
+# upper bound on concurrent Gemini calls per batch request (rate limits)
+BATCH_CONCURRENCY = 32
 
+@bp.route("/generate_metadata_batch", methods=["POST"])
+def generate_metadata_batch():
+    """
+   Generates metadata for several (vuln_name, platform) pairs, running the Gemini calls concurrently
+---
+tags:
+  - AI-Generated Metadata
+consumes:
+  - application/json
+produces:
+  - application/json
+parameters:
+  - name: body
+    in: body
+    required: true
+    schema:
+      type: object
+      properties:
+        items:
+          type: array
+          items:
+            type: object
+            properties:
+              vuln_name:
+                type: string
+                example: Prompt Injection
+              platform:
+                type: string
+                enum: [LLM, web, mobile, API]
+                example: LLM
+            required:
+              - vuln_name
+              - platform
+      required:
+        - items
+responses:
+  200:
+    description: One result per item, in request order; failed items carry an error instead of metadata
+  400:
+    description: Invalid input payload
 
-        if "@context" not in parsed:
-            parsed["@context"] = "https://schema.org/"
-        if "@type" not in parsed:
-            parsed["@type"] = "SecurityVulnerability"
+    """
+    try:
+        validated = decode_generate_batch(request.get_data()).items
+    except ValidationError as e:
+        return jsonify({"error": "validation_error", "messages": {"_schema": [str(e)]}}), 400
+    except msgspec.DecodeError:
+        return jsonify({"error": "Invalid or missing JSON payload"}), 400
 
-        return jsonify(parsed), 200
+    def run(item):
+        vuln_name = item.vuln_name.strip()
+        platform = item.platform.strip()
+        try:
+            return generate_cached(vuln_name, platform)
+        except Exception as e:
+            # GeminiClient.generate already logged the traceback
+            logger.warning("Generation failed for %s/%s: %s", vuln_name, platform, e)
+            return {"vuln_name": vuln_name, "platform": platform,
+                    "error": "generation_failed", "message": str(e)}
 
-    except Exception as e:
-        logger.exception("Generation failed")
-        return jsonify({"error": "generation_failed", "message": str(e)}), 502
\ No newline at end of file
+    # threads become greenlets under gevent workers, so the sync calls overlap either way
+    with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(validated))) as pool:
+        results = list(pool.map(run, validated))
+    return jsonify({"results": results}), 200
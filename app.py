@@ -4,14 +4,14 @@ from flask import Flask, jsonify
 from flasgger import Swagger
 from api.routes import bp as api_bp
 from utils.db import get_client
+from utils.serialization import ORJSONProvider
 from werkzeug.exceptions import HTTPException
 from flask import Flask
 from flask_cors import CORS
 
 def create_app():
     app = Flask(__name__)
-    # Allow requests only from your React app (secure)
-    CORS(app, resources={r"/api/*": {"origins": "http://localhost:8080"}})
+    app.json = ORJSONProvider(app)
     app.config["SWAGGER"] = {
         "title": "TCS Vulnerability Testcases API",
         "uiversion": 3
@@ -23,8 +23,13 @@ def create_app():
         "https://your-production-domain.com"
     ]
 
-    # Allow requests only from your React app (secure)
-    CORS(app, resources={r"/api/*": {"origins": allowed_origins}})
+    # Allow requests only from your React app (secure); max_age lets browsers
+    # cache preflight results instead of sending OPTIONS before every call
+    CORS(app, resources={r"/api/*": {
+        "origins": allowed_origins,
+        "methods": ["GET", "POST", "PUT", "DELETE"],
+        "max_age": 86400,
+    }})
 
     # register blueprint
     app.register_blueprint(api_bp)
@@ -42,7 +47,7 @@ def create_app():
     def handle_error(e):
         if isinstance(e, HTTPException):
             return jsonify({"error": e.description}), e.code
-        return jsonify({"error": f"Internal server error: {e.description}"}), 500
+        return jsonify({"error": f"Internal server error: {e}"}), 500
 
     return app
 
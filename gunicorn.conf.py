@@ -0,0 +1,10 @@
+# gunicorn.conf.py
+import multiprocessing
+import os
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+# gevent workers patch sockets, so one worker overlaps many in-flight Gemini/Mongo calls
+worker_class = "gevent"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+timeout = 120
@@ -1,80 +1,165 @@
 # schemas/testcase_schema.py
-from marshmallow import Schema, fields, validates, ValidationError, pre_load
+import time
+from typing import Annotated, List, Union
+
+import msgspec
+from msgspec import UNSET, UnsetType, ValidationError
 from utils.logger import get_logger
 
 logger = get_logger("Schema")
 PLATFORMS = {"LLM": "LLM", "WEB": "Web", "MOBILE_iOS": "Mobile_iOS", "MOBILE_ANDROID": "Mobile_Android", "API": "API"}
 
+# every accepted spelling (casefolded key or token) -> canonical token
+_PLATFORM_LOOKUP = {}
+for _key, _token in PLATFORMS.items():
+    _PLATFORM_LOOKUP[_key.casefold()] = _token
+    _PLATFORM_LOOKUP[_token.casefold()] = _token
+# exact common spellings (canonical, upper, lower) -> canonical token; hit without any string allocation
+_PLATFORM_FAST = {}
+for _spelling in (*PLATFORMS, *PLATFORMS.values()):
+    for _variant in (_spelling, _spelling.upper(), _spelling.lower()):
+        _PLATFORM_FAST[_variant] = _PLATFORM_LOOKUP[_variant.casefold()]
+_PLATFORM_ERROR = f"platform must be one of {list(PLATFORMS.values())}"
+
+_AUTOMATED_LOOKUP = {
+    "yes": True, "y": True, "true": True, "1": True,
+    "no": False, "n": False, "false": False, "0": False,
+}
+
 def normalize_platform(value):
     if not isinstance(value, str):
         raise ValidationError("platform must be a string")
-    v = value.strip()
-    # allow common variants, case-insensitive
-    for key in PLATFORMS:
-        if v.upper() == key:
-            return PLATFORMS[key]
-    # accept lowercase tokens
-    vl = v.lower()
-    for _, token in PLATFORMS.items():
-        if vl == token.lower():
-            return token
-    raise ValidationError(f"platform must be one of {list(PLATFORMS.values())}")
+    platform = _PLATFORM_FAST.get(value)
+    if platform is not None:
+        return platform
+    # allow other variants, case-insensitive
+    platform = _PLATFORM_LOOKUP.get(value.strip().casefold())
+    if platform is None:
+        raise ValidationError(_PLATFORM_ERROR)
+    return platform
 
 def normalize_automated(value):
-    # accept boolean or "yes"/"no"
+    # accept boolean, 1/0 or "yes"/"no"
     if isinstance(value, bool):
         return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
     if isinstance(value, str):
-        val = value.strip().lower()
-        if val in ("yes", "y", "true", "1"):
-            return True
-        if val in ("no", "n", "false", "0"):
-            return False
+        automated = _AUTOMATED_LOOKUP.get(value.strip().lower())
+        if automated is not None:
+            return automated
     raise ValidationError("Automated must be boolean or 'yes'/'no'")
 
-class TestCaseSchema(Schema):
-    vuln_id = fields.Str(required=True)
-    vuln_name = fields.Str(required=True)
-    platform = fields.Str(required=True)
-    analysis_type = fields.Str(required=False)
-    owasp_ref = fields.Str(required=False)
-    compliance = fields.Str(required=False)
-    vuln_abstract = fields.Str(required=False)
-    description = fields.Str(required=False)
-    recommendation = fields.Str(required=False)
-    example = fields.Str(required=False)
-    cvss_score = fields.Str(required=False, allow_none=True)
-    automated = fields.Raw(required=False, allow_none=True)
-    severity = fields.Str(required=False)
-    @pre_load
-    def normalize(self, data, **kwargs):
-        # normalize platform if present
-        if "platform" in data and data["platform"] is not None:
-            data["platform"] = normalize_platform(data["platform"])
-        if "Automated" in data and data["Automated"] is not None:
-            data["Automated"] = normalize_automated(data["Automated"])
-        return data
-
-    # @validates("cvss_score")
-    # def validate_cvss(self, value):
-    #     if value is None or "":
+class TestCase(msgspec.Struct, forbid_unknown_fields=True, omit_defaults=True):
+    vuln_id: str
+    vuln_name: str
+    platform: str
+    analysis_type: Union[str, UnsetType] = UNSET
+    owasp_ref: Union[str, UnsetType] = UNSET
+    compliance: Union[str, UnsetType] = UNSET
+    vuln_abstract: Union[str, UnsetType] = UNSET
+    description: Union[str, UnsetType] = UNSET
+    recommendation: Union[str, UnsetType] = UNSET
+    example: Union[str, UnsetType] = UNSET
+    cvss_score: Union[str, None, UnsetType] = UNSET
+    # accepted as bool, 1/0 or yes/no text; always stored as bool (or None)
+    automated: Union[bool, int, str, None, UnsetType] = UNSET
+    severity: Union[str, UnsetType] = UNSET
+
+    def __post_init__(self):
+        self.platform = normalize_platform(self.platform)
+        if self.automated is not UNSET and self.automated is not None:
+            self.automated = normalize_automated(self.automated)
+
+    # def validate_cvss(self):
+    #     if self.cvss_score is None or "":
     #         return
-    #     if not (0.0 <= float(value) <= 10.0):
-    #         raise ValidationError("cvss_score must be between 0.0 and 10.0")
+    #     if not (0.0 <= float(self.cvss_score) <= 10.0):
+    #         raise ValueError("cvss_score must be between 0.0 and 10.0")
+
+_TEST_CASE_FIELDS = {f.name: f.type for f in msgspec.structs.fields(TestCase)}
+
+_MISSING = object()
+
+def _fold_automated(data):
+    # payloads documented with "Automated" map onto the "automated" field;
+    # the caller's dict is only copied when the key is actually present
+    if isinstance(data, dict):
+        value = data.get("Automated", _MISSING)
+        if value is not _MISSING:
+            data = dict(data)
+            del data["Automated"]
+            data["automated"] = value
+    return data
+
+def load_test_case(data):
+    """Validate a decoded test case object and return it as a plain dict (unset fields omitted)."""
+    return msgspec.to_builtins(msgspec.convert(_fold_automated(data), TestCase))
+
+def load_test_cases(items):
+    """Validate a list of decoded test case objects in a single msgspec call."""
+    if isinstance(items, list):
+        items = [_fold_automated(item) for item in items]
+    return msgspec.to_builtins(msgspec.convert(items, List[TestCase]))
+
+def load_partial_test_case(data):
+    """Validate only the fields present in a partial update and return them normalized."""
+    validated = {}
+    for key, value in _fold_automated(data).items():
+        if key == "platform":
+            value = normalize_platform(value)
+        elif key == "automated":
+            value = None if value is None else normalize_automated(value)
+        elif key in _TEST_CASE_FIELDS:
+            value = msgspec.convert(value, _TEST_CASE_FIELDS[key])
+        else:
+            raise ValidationError(f"Unknown field: {key}")
+        validated[key] = value
+    return validated
 
 # ------------------------------------------------------------------------------
 # Input Schema
 # ------------------------------------------------------------------------------
 
-class GenerateSchema(Schema):
-    vuln_name = fields.Str(required=True)
-    platform = fields.Str(required=True)
+# generate only accepts canonical platform tokens (no case variants)
+_GENERATE_PLATFORMS = frozenset(PLATFORMS.values())
+_GENERATE_PLATFORM_ERROR = f"platform must be one of {sorted(_GENERATE_PLATFORMS)}"
+
+# rejected platforms are logged at most once per interval so bad clients cannot flood the log
+_REJECT_LOG_INTERVAL = 1.0
+_last_reject_log = 0.0
+_suppressed_rejects = 0
+
+def _log_rejected_platform(value):
+    global _last_reject_log, _suppressed_rejects
+    now = time.monotonic()
+    if now - _last_reject_log < _REJECT_LOG_INTERVAL:
+        _suppressed_rejects += 1
+        return
+    logger.info("Not allowed: %s (%d similar suppressed)", value, _suppressed_rejects)
+    _last_reject_log = now
+    _suppressed_rejects = 0
+
+class GenerateRequest(msgspec.Struct, forbid_unknown_fields=True):
+    vuln_name: str
+    platform: str
+
+    def __post_init__(self):
+        if self.platform not in _GENERATE_PLATFORMS:
+            _log_rejected_platform(self.platform)
+            raise ValidationError(_GENERATE_PLATFORM_ERROR)
+
+class GenerateBatchRequest(msgspec.Struct, forbid_unknown_fields=True):
+    items: Annotated[List[GenerateRequest], msgspec.Meta(min_length=1)]
 
-    @validates("platform")
-    def validate_platform(self, value, **kwargs):
-        allowed = {"LLM", "Web", "Mobile_iOS", "Mobile_Android", "API"}
+# Decoders are built once; each decode parses and validates the raw body in one C pass
+GENERATE_DECODER = msgspec.json.Decoder(GenerateRequest)
+GENERATE_BATCH_DECODER = msgspec.json.Decoder(GenerateBatchRequest)
 
-        if value not in allowed:
-            logger.info(f"Not allowed: {value}")
-            raise ValidationError(f"platform must be one of {sorted(list(allowed))}")
+def decode_generate_request(raw):
+    """Parse and validate a raw /generate_metadata body."""
+    return GENERATE_DECODER.decode(raw)
 
+def decode_generate_batch(raw):
+    """Parse and validate a raw /generate_metadata_batch body."""
+    return GENERATE_BATCH_DECODER.decode(raw)
@@ -1,45 +1,101 @@
 # setup_db.py
 import os
-import json
+import gzip
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import ijson
+import orjson
+from bson import ObjectId, encode
+from bson.raw_bson import RawBSONDocument
 from pymongo import errors
-from utils.db import get_collection
+from pymongo.write_concern import WriteConcern
+from utils.db import get_collection, ensure_indexes
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 SAMPLE_FILE = os.getenv("SAMPLE_FILE", "./sample/test_cases.json")
+SAMPLE_BATCH_SIZE = int(os.getenv("SAMPLE_BATCH_SIZE", "500"))
+SAMPLE_INSERT_WORKERS = int(os.getenv("SAMPLE_INSERT_WORKERS", "4"))
+# set SAMPLE_WRITE_W=1 to have duplicates and other write errors reported
+SAMPLE_WRITE_W = int(os.getenv("SAMPLE_WRITE_W", "0"))
+SAMPLE_STREAM_THRESHOLD = int(os.getenv("SAMPLE_STREAM_THRESHOLD_BYTES", str(64 * 1024 * 1024)))
 
 def create_index():
-    coll = get_collection()
     try:
-        coll.create_index("vuln_id", unique=True, name="uniq_vuln_id")
-        logging.info("Unique index ensured on 'vuln_id'")
+        # same index definitions the API ensures, but a failure here is fatal
+        ensure_indexes(get_collection(), raise_errors=True)
+        logging.info("Indexes ensured on 'platform' and unique 'vuln_id'")
     except errors.PyMongoError as e:
         logging.error("Index creation failed: %s", e)
         raise
 
+def _iter_test_cases(sample_path):
+    compressed = sample_path.endswith(".gz")
+    opener = gzip.open if compressed else open
+    with opener(sample_path, "rb") as fh:
+        # a .gz file's size on disk says nothing about its expanded size, so it always streams
+        if not compressed and os.path.getsize(sample_path) <= SAMPLE_STREAM_THRESHOLD:
+            # small files: one orjson parse beats incremental parsing
+            data = orjson.loads(fh.read())
+            test_cases = data.get("test_cases", []) if isinstance(data, dict) else []
+            if isinstance(test_cases, list):
+                yield from test_cases
+        else:
+            # large files: stream one item at a time so memory stays bounded by SAMPLE_BATCH_SIZE
+            # use_float: ijson defaults to Decimal, which BSON cannot encode
+            yield from ijson.items(fh, "test_cases.item", use_float=True)
+
+def _encode(tc):
+    # encode to BSON once up front; pymongo sends RawBSONDocument bytes as-is.
+    # _id is assigned client-side here, as pymongo would for a plain dict
+    tc.setdefault("_id", ObjectId())
+    return RawBSONDocument(encode(tc))
+
+def _insert_batch(coll, batch):
+    try:
+        coll.insert_many(batch, ordered=False)
+        # pymongo does not collect inserted_ids for RawBSONDocument inputs
+        return len(batch)
+    except errors.BulkWriteError as bwe:
+        # one bad doc should not abort the rest of the ingest
+        logging.warning("BulkWriteError during sample load: %s", bwe.details.get("writeErrors", []))
+        return bwe.details.get("nInserted", 0)
+
 def load_sample(sample_path=SAMPLE_FILE):
     if not os.path.exists(sample_path):
         logging.warning("Sample file not found: %s", sample_path)
         return
-    coll = get_collection()
-    with open(sample_path, "r", encoding="utf-8") as fh:
-        data = json.load(fh)
-    test_cases = data.get("test_cases", []) if isinstance(data, dict) else []
-    docs = []
-    for tc in test_cases:
-        if isinstance(tc, dict) and tc.get("vuln_id"):
-            docs.append(tc)
-    if not docs:
-        logging.warning("No valid test cases found in sample")
-        return
+    # seed data is reproducible from the file, so by default skip write acks (w=0)
+    coll = get_collection().with_options(write_concern=WriteConcern(w=SAMPLE_WRITE_W))
+    docs = (_encode(tc) for tc in _iter_test_cases(sample_path) if isinstance(tc, dict) and tc.get("vuln_id"))
+    found = inserted = 0
+    batch = []
     try:
-        coll.insert_many(docs, ordered=False)
-        logging.info("Inserted %d sample docs", len(docs))
-    except errors.BulkWriteError as bwe:
-        logging.warning("BulkWriteError during sample load: %s", bwe.details.get("writeErrors", []))
+        # overlap insert round-trips; pending batches are capped so memory stays bounded
+        with ThreadPoolExecutor(max_workers=SAMPLE_INSERT_WORKERS) as pool:
+            pending = deque()
+            for tc in docs:
+                batch.append(tc)
+                found += 1
+                if len(batch) >= SAMPLE_BATCH_SIZE:
+                    pending.append(pool.submit(_insert_batch, coll, batch))
+                    batch = []
+                    if len(pending) >= 2 * SAMPLE_INSERT_WORKERS:
+                        inserted += pending.popleft().result()
+            if batch:
+                pending.append(pool.submit(_insert_batch, coll, batch))
+            inserted += sum(f.result() for f in pending)
     except errors.PyMongoError as e:
         logging.error("DB error: %s", e)
         raise
+    if not found:
+        logging.warning("No valid test cases found in sample")
+        return
+    if SAMPLE_WRITE_W == 0:
+        # unacknowledged: duplicates and other write errors are not reported back
+        logging.info("Sent %d sample docs (unacknowledged)", inserted)
+    else:
+        logging.info("Inserted %d sample docs", inserted)
 
 if __name__ == "__main__":
     create_index()
@@ -1,24 +1,90 @@
 # utils/db.py
 import os
-from pymongo import MongoClient, errors
+import threading
+from pymongo import MongoClient, ASCENDING, errors
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "tcs_vuln_db")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "vuln_testcases")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "200"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+# negotiated with the server per connection; unavailable codecs are skipped
+# (zlib is only the fallback, at a cheap compression level)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
 
 _client = None
+_collection = None
+_indexes = frozenset()
+_lock = threading.Lock()
 
 def get_client():
     global _client
     if _client is None:
-        _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        # test connectivity
-        try:
-            _client.admin.command("ping")
-        except errors.ServerSelectionTimeoutError:
-            raise
+        with _lock:
+            # re-check: another thread may have connected while we waited
+            if _client is None:
+                client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, maxPoolSize=MONGO_MAX_POOL_SIZE,
+                                     minPoolSize=MONGO_MIN_POOL_SIZE, compressors=MONGO_COMPRESSORS,
+                                     zlibCompressionLevel=3, retryWrites=True, appname="testcase_editor")
+                # test connectivity once; only publish a client that answered
+                try:
+                    client.admin.command("ping")
+                except errors.PyMongoError:
+                    client.close()
+                    raise
+                _client = client
     return _client
 
+# platform backs the GET filter; vuln_id backs the duplicate-key check on insert
+INDEXES = (
+    ([("platform", ASCENDING)], {"name": "platform_1"}),
+    ([("vuln_id", ASCENDING)], {"name": "uniq_vuln_id", "unique": True}),
+)
+
+def ensure_indexes(coll, raise_errors=False):
+    # a failing index (e.g. duplicate vuln_ids already stored) is logged and skipped
+    # unless raise_errors is set, so it cannot take the API down; the handle is cached either way
+    global _indexes
+    try:
+        # one listIndexes round-trip; existing indexes skip createIndexes (and its uniqueness scan)
+        existing = coll.index_information()
+    except errors.PyMongoError as e:
+        if raise_errors:
+            raise
+        logger.error("Could not list indexes: %s", e)
+        existing = {}
+    ready = set()
+    for keys, options in INDEXES:
+        if options["name"] in existing:
+            ready.add(options["name"])
+            continue
+        try:
+            # background keeps the first build on a populated collection from blocking writes
+            coll.create_index(keys, background=True, **options)
+            ready.add(options["name"])
+        except errors.PyMongoError as e:
+            if raise_errors:
+                raise
+            logger.error("Index %s could not be created: %s", options["name"], e)
+    _indexes = frozenset(ready)
+    return _indexes
+
+def has_index(name):
+    # true for indexes ensure_indexes found or created in this process
+    return name in _indexes
+
 def get_collection():
-    client = get_client()
-    return client[DB_NAME][COLLECTION_NAME]
+    # resolved once per process; routes call this on every request
+    global _collection
+    if _collection is None:
+        client = get_client()
+        with _lock:
+            # same double-checked pattern as get_client, so indexes are ensured once
+            if _collection is None:
+                coll = client[DB_NAME][COLLECTION_NAME]
+                ensure_indexes(coll)
+                _collection = coll
+    return _collection
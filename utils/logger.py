@@ -1,35 +1,120 @@
+import atexit
+import functools
+import io
 import logging
+import os
 import sys
-from colorama import Fore, Style, init as colorama_init
+import threading
+from logging.handlers import MemoryHandler
 
-colorama_init(autoreset=True)
+# Color only when writing to a terminal; container/production logs stay plain
+_USE_COLOR = sys.stdout.isatty()
+if _USE_COLOR and os.name == "nt":
+    # legacy Windows consoles need colorama to interpret ANSI escapes
+    from colorama import just_fix_windows_console
+    just_fix_windows_console()
+
+_RESET = "\x1b[0m"
 
 
 class ColoredFormatter(logging.Formatter):
     COLORS = {
-        logging.DEBUG: Fore.CYAN,
-        logging.INFO: Fore.GREEN,
-        logging.WARNING: Fore.YELLOW,
-        logging.ERROR: Fore.RED,
-        logging.CRITICAL: Fore.MAGENTA,
+        logging.DEBUG: "\x1b[36m",     # cyan
+        logging.INFO: "\x1b[32m",      # green
+        logging.WARNING: "\x1b[33m",   # yellow
+        logging.ERROR: "\x1b[31m",     # red
+        logging.CRITICAL: "\x1b[35m",  # magenta
     }
 
     def format(self, record):
-        log_color = self.COLORS.get(record.levelno, "")
-        formatted = super().format(record)
-        return f"{log_color}{formatted}{Style.RESET_ALL}"
+        if not _USE_COLOR:
+            return super().format(record)
+        return self.COLORS.get(record.levelno, "") + super().format(record) + _RESET
+
+
+class _DeferredFlushStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the MemoryHandler draining it."""
+
+    def flush(self):
+        pass
+
+    def flush_stream(self):
+        super().flush()
+
+
+class _BatchingMemoryHandler(MemoryHandler):
+    """MemoryHandler that flushes the target stream once per drained batch.
+
+    A batch is also drained once its oldest record is ``flush_interval`` seconds
+    old, so a quiet worker never holds records back for long.
+    """
+
+    def __init__(self, capacity, flushLevel, target, flush_interval):
+        super().__init__(capacity, flushLevel=flushLevel, target=target)
+        self.flush_interval = flush_interval
+        self._timer = None
+
+    def shouldFlush(self, record):
+        return (super().shouldFlush(record)
+                or record.created - self.buffer[0].created >= self.flush_interval)
 
+    def emit(self, record):
+        super().emit(record)
+        # no further record may arrive to trigger shouldFlush; drain on a timer instead
+        if self.buffer and self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
 
+    def flush(self):
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            super().flush()
+            if self.target is not None:
+                self.target.flush_stream()
+
+
+def _build_handler():
+    formatter = ColoredFormatter(
+        "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if _USE_COLOR or os.getenv("PYTHONUNBUFFERED"):
+        # interactive terminal, or unbuffered output requested: keep immediate, line-by-line output
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(formatter)
+        return handler
+    try:
+        # block-buffered view of stdout; closefd=False leaves the real stdout open
+        stream = open(sys.stdout.fileno(), "w", buffering=1 << 16, encoding=sys.stdout.encoding or "utf-8",
+                      closefd=False)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        stream = sys.stdout
+    target = _DeferredFlushStreamHandler(stream)
+    target.setFormatter(formatter)
+    # records are written in batches; ERROR and above flush immediately
+    handler = _BatchingMemoryHandler(capacity=int(os.getenv("LOG_BUFFER_CAPACITY", "1024")),
+                                     flushLevel=logging.ERROR, target=target,
+                                     flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")))
+    atexit.register(handler.flush)
+    return handler
+
+
+_HANDLER = None
+
+
+# one configured logger per (name, level); repeat calls skip the logging manager lock
+@functools.lru_cache(maxsize=None)
 def get_logger(name: str, level=logging.INFO):
+    global _HANDLER
     logger = logging.getLogger(name)
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        formatter = ColoredFormatter(
-            "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        # all loggers share one handler, so there is a single buffer over stdout
+        if _HANDLER is None:
+            _HANDLER = _build_handler()
+        logger.addHandler(_HANDLER)
         logger.propagate = False
     logger.setLevel(level)
     return logger
@@ -0,0 +1,26 @@
+# utils/serialization.py
+import orjson
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+
+def bson_default(obj):
+    # orjson handles datetime natively; only BSON-specific types need help
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj) -> bytes:
+    # non-str dict keys are stringified, as stdlib json does
+    return orjson.dumps(obj, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, so jsonify() and request.get_json() use it too."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)